@@ -190,6 +190,18 @@ async fn handle_incoming_messages(
                     }
                     Message::Binary(data) => {
                         debug!("📥 Received binary from {}: {} bytes", peer_addr, data.len());
+                        
+                        // The ML service sends binary frames holding JSON or,
+                        // for anomaly predictions, MessagePack
+                        let json = serde_json::from_slice::<serde_json::Value>(&data)
+                            .ok()
+                            .or_else(|| rmp_serde::from_slice::<serde_json::Value>(&data).ok());
+                        
+                        if let Some(json) = json {
+                            handle_client_message(json, peer_addr, &cmd_tx, &anomaly_score).await;
+                        } else {
+                            warn!("⚠️  Undecodable binary frame from {} ({} bytes)", peer_addr, data.len());
+                        }
                     }
                     Message::Ping(_data) => {
                         debug!("🏓 Ping from {}", peer_addr);
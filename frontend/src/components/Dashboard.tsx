@@ -10,7 +10,7 @@ import LiveChart from './LiveChart'
 import SensorPanel from './SensorPanel'
 import AnomalyAlert from './AnomalyAlert'
 import type { SensorData } from '../types/sensor'
-import { vec3Magnitude } from '../types/sensor'
+import { vec3Magnitude, ANOMALY_THRESHOLD } from '../types/sensor'
 
 interface DashboardProps {
   sensorData: SensorData
@@ -67,7 +67,7 @@ function Dashboard({ sensorData, onInjectFault }: DashboardProps) {
 
     // Check for anomalies (only show alert once per anomaly event)
     const currentTime = Date.now()
-    if (sensorData.anomaly_score && sensorData.anomaly_score > 0.7) {
+    if (sensorData.anomaly_score && sensorData.anomaly_score > ANOMALY_THRESHOLD) {
       // Only show alert if:
       // 1. It hasn't been dismissed manually
       // 2. At least 10 seconds since last alert
@@ -201,7 +201,7 @@ function Dashboard({ sensorData, onInjectFault }: DashboardProps) {
           <div className="section-card">
             <h2 className="section-title">
               ANOMALY DETECTION
-              {sensorData.anomaly_score && sensorData.anomaly_score > 0.7 && (
+              {sensorData.anomaly_score && sensorData.anomaly_score > ANOMALY_THRESHOLD && (
                 <span className="alert-badge">⚠️ HIGH</span>
               )}
             </h2>
@@ -5,7 +5,7 @@
  */
 
 import type { SensorData } from '../types/sensor'
-import { getHealthStatus, getHealthColor, formatNumber, vec3Magnitude } from '../types/sensor'
+import { getHealthStatus, getHealthColor, formatNumber, vec3Magnitude, ANOMALY_THRESHOLD } from '../types/sensor'
 
 interface SensorPanelProps {
   sensorData: SensorData
@@ -73,7 +73,7 @@ function SensorPanel({ sensorData }: SensorPanelProps) {
                 <span
                   className="health-value"
                   style={{
-                    color: sensorData.anomaly_score > 0.7 ? '#ff3366' : '#00ff88',
+                    color: sensorData.anomaly_score > ANOMALY_THRESHOLD ? '#ff3366' : '#00ff88',
                   }}
                 >
                   {(sensorData.anomaly_score * 100).toFixed(0)}%
@@ -85,7 +85,7 @@ function SensorPanel({ sensorData }: SensorPanelProps) {
                   style={{
                     width: `${sensorData.anomaly_score * 100}%`,
                     backgroundColor:
-                      sensorData.anomaly_score > 0.7 ? '#ff3366' : '#00ff88',
+                      sensorData.anomaly_score > ANOMALY_THRESHOLD ? '#ff3366' : '#00ff88',
                   }}
                 />
               </div>
@@ -64,6 +64,12 @@ export interface SensorData {
   anomaly_score?: number
 }
 
+/**
+ * Anomaly score above which a reading is flagged
+ * (keep in sync with MLServiceConfig.anomaly_threshold)
+ */
+export const ANOMALY_THRESHOLD = 0.66
+
 /**
  * WebSocket message types
  */
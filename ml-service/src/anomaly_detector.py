@@ -5,16 +5,29 @@ Implements real-time anomaly detection using Isolation Forest algorithm
 with adaptive learning and statistical analysis.
 """
 
+import copy
 import logging
+import math
+import threading
 import numpy as np
 from typing import List, Optional
-from collections import deque
+from collections import OrderedDict
 from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
 from scipy import stats
 
 logger = logging.getLogger(__name__)
 
+# Trees added per warm-started retrain, and the forest size at which the
+# model is rebuilt from scratch instead (every tree adds to scoring cost)
+WARM_START_STEP = 20
+MAX_ESTIMATORS = 160
+
+# Number of recent (sample, decision score) pairs remembered between retrains
+SCORE_CACHE_SIZE = 256
+
+# Number of recent anomaly scores averaged in get_statistics
+HISTORY_SIZE = 100
+
 
 class AnomalyDetector:
     """
@@ -24,40 +37,73 @@ class AnomalyDetector:
     to detect anomalies in high-frequency sensor streams.
     """
     
-    def __init__(self, buffer_size: int = 50, threshold: float = 0.7):
+    def __init__(
+        self,
+        buffer_size: int = 50,
+        threshold: float = 0.66,
+        buffer_dtype: np.dtype = np.float32,
+        n_jobs: Optional[int] = -1
+    ):
         """
         Initialize anomaly detector
         
         Args:
             buffer_size: Number of samples to keep for model training
             threshold: Anomaly score threshold (0-1)
+            buffer_dtype: Storage type of the training buffer; float16 halves
+                memory traffic but should only be used for features already
+                normalized to roughly unit range
+            n_jobs: CPU cores used to build Isolation Forest trees (-1 = all)
         """
         self.buffer_size = buffer_size
         self.threshold = threshold
+        self.buffer_dtype = np.dtype(buffer_dtype)
+        self.n_jobs = n_jobs
         
-        # Data buffer for training
-        self.data_buffer = deque(maxlen=buffer_size)
+        # Ring buffer of recent samples for training, allocated on the first
+        # prediction once the feature dimension is known
+        self._buf: Optional[np.ndarray] = None
+        self._head = 0   # Next slot to write
+        self._count = 0  # Number of valid rows
         
-        # Isolation Forest model
-        self.model = IsolationForest(
-            n_estimators=100,
-            contamination=0.1,  # Assume 10% of data may be anomalous
-            random_state=42,
-            max_samples='auto',
-            bootstrap=False
-        )
+        # Guards the ring buffer and the published model so update_model can
+        # run in a worker thread while predictions continue
+        self._lock = threading.Lock()
         
-        # Feature scaler for normalization
-        self.scaler = StandardScaler()
+        # Bumped by reset() so a retrain started before it cannot publish
+        self._generation = 0
+        
+        # Running moments of the buffered window (float64 to limit drift)
+        self._sum: Optional[np.ndarray] = None
+        self._sumsq: Optional[np.ndarray] = None
+        self._window_mean: Optional[np.ndarray] = None
+        self._window_inv_std: Optional[np.ndarray] = None
+        
+        # Isolation Forest model
+        self.model = self._build_model()
         
         # Model state
         self.is_trained = False
         self.feature_count = None
         
+        # Standardization parameters from the last fit (mean, 1 / std)
+        self._sc_mean: Optional[np.ndarray] = None
+        self._sc_inv_scale: Optional[np.ndarray] = None
+        self._scaled: Optional[np.ndarray] = None
+        
+        # LRU cache of decision scores keyed by the stored sample bytes, so
+        # repeated readings (e.g. an idle sensor) skip the forest
+        self._score_cache: OrderedDict = OrderedDict()
+        
         # Statistics tracking
         self.prediction_count = 0
         self.anomaly_count = 0
-        self.anomaly_history = deque(maxlen=100)
+        
+        # Ring buffer of recent scores with a running sum for the average
+        self._hist = np.zeros(HISTORY_SIZE, dtype=np.float32)
+        self._hist_head = 0
+        self._hist_count = 0
+        self._hist_sum = 0.0
         
         # Feature statistics for additional validation
         self.feature_means = None
@@ -75,174 +121,376 @@ class AnomalyDetector:
         Returns:
             Anomaly score between 0 (normal) and 1 (anomalous)
         """
-        self.prediction_count += 1
-        
         # Validate features
         if not features or len(features) == 0:
+            self.prediction_count += 1
             logger.warning("⚠️  Empty feature vector received")
             return 0.0
         
-        # Convert to numpy array
-        features_array = np.array(features).reshape(1, -1)
+        return self.predict_batch(np.asarray(features, dtype=np.float32).reshape(1, -1))[0]
+    
+    def predict_batch(self, features_batch: np.ndarray) -> List[float]:
+        """
+        Predict anomaly scores for a batch of samples in arrival order
+        
+        The forest is evaluated once for the whole batch; buffering, training
+        and statistics otherwise behave as if each row went through predict().
+        
+        Args:
+            features_batch: Array of shape (n_samples, n_features)
+            
+        Returns:
+            Anomaly scores between 0 (normal) and 1 (anomalous), one per row
+        """
+        # Round to the buffer's storage type so samples are scored exactly
+        # as they will be remembered and trained on
+        features_batch = np.asarray(features_batch, dtype=self.buffer_dtype)
+        
+        if features_batch.ndim != 2 or len(features_batch) == 0:
+            logger.warning("⚠️  Empty feature batch received")
+            return []
+        
+        self.prediction_count += len(features_batch)
+        n_features = features_batch.shape[1]
         
         # Store feature count on first prediction
         if self.feature_count is None:
-            self.feature_count = len(features)
+            self.feature_count = n_features
             logger.info(f"📊 Feature dimension: {self.feature_count}")
         
         # Validate feature dimension consistency
-        if len(features) != self.feature_count:
+        if n_features != self.feature_count:
             logger.warning(
                 f"⚠️  Feature dimension mismatch: expected {self.feature_count}, "
-                f"got {len(features)}"
+                f"got {n_features}"
             )
-            return 0.0
-        
-        # Add to buffer for future training
-        self.data_buffer.append(features)
-        
-        # If not enough data yet, use statistical methods only
-        if len(self.data_buffer) < 20:
-            anomaly_score = self._statistical_anomaly_score(features_array)
-            self.anomaly_history.append(anomaly_score)
-            return anomaly_score
+            return [0.0] * len(features_batch)
         
-        # Train model if not yet trained or needs update
-        if not self.is_trained and len(self.data_buffer) >= self.buffer_size:
-            self.update_model()
+        scores = []
+        decision_scores = None
+        decision_offset = 0
         
-        # Predict using trained model
-        if self.is_trained:
+        for i, sample in enumerate(features_batch):
+            # Add to buffer for future training
+            self._push(sample)
+            
+            # Score against the buffered window, excluding this sample
+            stat_score = self._statistical_anomaly_score(sample)
+            
+            # If not enough data yet, use statistical methods only
+            if self._count < 20:
+                self._record_score(stat_score)
+                scores.append(stat_score)
+                continue
+            
+            # Train model if not yet trained or needs update
+            if not self.is_trained and self._count >= self.buffer_size:
+                self.update_model()
+            
+            if not self.is_trained:
+                # Fallback to statistical method
+                self._record_score(stat_score)
+                scores.append(stat_score)
+                continue
+            
+            # Predict using trained model
             try:
-                # Scale features
-                features_scaled = self.scaler.transform(features_array)
-                
-                # Get anomaly score from Isolation Forest
-                # Returns -1 for outliers, 1 for inliers
-                prediction = self.model.predict(features_scaled)[0]
+                # Evaluate the forest once for the remainder of the batch
+                if decision_scores is None:
+                    decision_scores = self._decision_scores(features_batch[i:])
+                    decision_offset = i
                 
-                # Get decision function score (more granular than binary prediction)
-                # More negative = more anomalous
-                decision_score = self.model.decision_function(features_scaled)[0]
+                # Decision scores range from about -0.5 (anomalous) to 0.5 (normal)
+                decision_score = decision_scores[i - decision_offset]
                 
-                # Convert to 0-1 range (higher = more anomalous)
-                # Use sigmoid-like transformation
-                anomaly_score = self._normalize_score(decision_score)
-                
-                # Combine with statistical methods for robustness
-                stat_score = self._statistical_anomaly_score(features_array)
-                final_score = 0.7 * anomaly_score + 0.3 * stat_score
+                # Invert and map to 0-1 with a sigmoid (higher = more anomalous),
+                # then combine with statistical methods for robustness
+                final_score = 0.7 / (1.0 + math.exp(10.0 * decision_score)) + 0.3 * stat_score
                 
                 # Track anomalies
-                self.anomaly_history.append(final_score)
+                self._record_score(final_score)
                 if final_score > self.threshold:
                     self.anomaly_count += 1
                 
-                return float(final_score)
+                scores.append(final_score)
                 
             except Exception as e:
                 logger.error(f"❌ Prediction error: {e}", exc_info=True)
-                return self._statistical_anomaly_score(features_array)
+                scores.append(stat_score)
+        
+        return scores
+    
+    def _decision_scores(self, features_batch: np.ndarray) -> List[float]:
+        """
+        Get decision scores for a batch, evaluating the model only for rows
+        not found in the score cache
+        
+        Args:
+            features_batch: Unscaled array of shape (n_samples, n_features)
+            
+        Returns:
+            Decision scores, one per row (negative = outlier)
+        """
+        keys = [sample.tobytes() for sample in features_batch]
+        
+        # Hold the lock so a concurrent retrain cannot swap the model and
+        # clear the cache mid-batch
+        with self._lock:
+            cache = self._score_cache
+            scores = [cache.get(key) for key in keys]
+            misses = [j for j, score in enumerate(scores) if score is None]
+            
+            for j, key in enumerate(keys):
+                if scores[j] is not None:
+                    cache.move_to_end(key)
+            
+            if misses:
+                computed = self._evaluate_model(features_batch[misses]).tolist()
+                for j, score in zip(misses, computed):
+                    scores[j] = score
+                    cache[keys[j]] = score
+                
+                while len(cache) > SCORE_CACHE_SIZE:
+                    cache.popitem(last=False)
+        
+        return scores
+    
+    def _evaluate_model(self, features_batch: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the model's decision function on a batch
+        
+        Args:
+            features_batch: Unscaled array of shape (n_samples, n_features)
+            
+        Returns:
+            Decision scores, one per row (negative = outlier)
+        """
+        n_samples = len(features_batch)
+        if self._scaled is None or len(self._scaled) < n_samples:
+            self._scaled = np.empty((n_samples, self.feature_count), dtype=np.float32)
+        
+        # Standardize features in place with the cached parameters
+        features_scaled = self._scaled[:n_samples]
+        np.subtract(features_batch, self._sc_mean, out=features_scaled)
+        np.multiply(features_scaled, self._sc_inv_scale, out=features_scaled)
+        
+        return self.model.decision_function(features_scaled)
+    
+    def _push(self, sample: np.ndarray):
+        """
+        Write a sample into the ring buffer, overwriting the oldest when full
+        
+        Args:
+            sample: Feature vector of length feature_count
+        """
+        if self._buf is None:
+            self._buf = np.empty((self.buffer_size, self.feature_count), dtype=self.buffer_dtype)
+            self._sum = np.zeros(self.feature_count, dtype=np.float64)
+            self._sumsq = np.zeros(self.feature_count, dtype=np.float64)
+        
+        with self._lock:
+            # Evict the oldest sample from the running moments
+            if self._count == self.buffer_size:
+                evicted = self._buf[self._head].astype(np.float64)
+                self._sum -= evicted
+                self._sumsq -= evicted * evicted
+            
+            self._buf[self._head] = sample
+            stored = self._buf[self._head].astype(np.float64)
+            self._sum += stored
+            self._sumsq += stored * stored
+            
+            self._head = (self._head + 1) % self.buffer_size
+            self._count = min(self._count + 1, self.buffer_size)
+        
+        # Recompute exactly once per lap so rounding error cannot accumulate
+        if self._head == 0:
+            window = self._buf[:self._count].astype(np.float64)
+            self._sum = window.sum(axis=0)
+            self._sumsq = (window * window).sum(axis=0)
+        
+        # Cache mean and inverse std (float32) of the window excluding the
+        # newest sample for the statistical score
+        history_count = self._count - 1
+        if history_count == 0:
+            return
+        mean = (self._sum - stored) / history_count
+        variance = np.maximum((self._sumsq - stored * stored) / history_count - mean * mean, 0.0)
+        self._window_mean = mean.astype(np.float32)
+        self._window_inv_std = (1.0 / (np.sqrt(variance) + 1e-6)).astype(np.float32)  # Avoid division by zero
+    
+    def _record_score(self, score: float):
+        """
+        Add a score to the recent-score history, evicting the oldest when full
+        
+        Args:
+            score: Anomaly score (0-1)
+        """
+        head = self._hist_head
+        if self._hist_count == HISTORY_SIZE:
+            self._hist_sum -= float(self._hist[head])
         else:
-            # Fallback to statistical method
-            anomaly_score = self._statistical_anomaly_score(features_array)
-            self.anomaly_history.append(anomaly_score)
-            return anomaly_score
+            self._hist_count += 1
+        
+        self._hist[head] = score
+        self._hist_sum += float(self._hist[head])
+        self._hist_head = (head + 1) % HISTORY_SIZE
+        
+        # Recompute exactly once per lap so rounding error cannot accumulate
+        if self._hist_head == 0:
+            self._hist_sum = float(self._hist.sum(dtype=np.float64))
+    
+    def _window_views(self):
+        """
+        Get buffered samples as two zero-copy views in arrival order
+        
+        Returns:
+            Tuple (older, newer) of row views; older is empty until the
+            ring buffer has wrapped around
+        """
+        return self._buf[self._head:self._count], self._buf[:self._head]
+    
+    def _training_window(self) -> np.ndarray:
+        """
+        Copy buffered samples into one contiguous float32 array, oldest first
+        
+        Returns:
+            Array of shape (count, feature_count)
+        """
+        older, newer = self._window_views()
+        
+        window = np.empty((self._count, self.feature_count), dtype=np.float32)
+        window[:len(older)] = older
+        window[len(older):] = newer
+        return window
+    
+    def _build_model(self):
+        """
+        Create an untrained Isolation Forest
+        
+        Returns:
+            Warm-startable scikit-learn model
+        """
+        # Fitted on the CPU: RAPIDS cuML has no Isolation Forest estimator
+        # to offload training to
+        return IsolationForest(
+            n_estimators=100,
+            contamination='auto',  # Fixed offset, no threshold fit per retrain
+            random_state=42,
+            max_samples='auto',
+            bootstrap=False,
+            warm_start=True,  # Retrains append trees instead of rebuilding
+            n_jobs=self.n_jobs  # Build trees in parallel
+        )
     
     def update_model(self):
         """
         Retrain the anomaly detection model with buffered data
+        
+        Safe to call from a worker thread: the model is fitted on a snapshot
+        of the buffer and swapped in atomically, so predictions keep using
+        the previous model until training completes. If training fails,
+        the previously published model stays in use.
         """
-        if len(self.data_buffer) < 20:
-            logger.warning(f"⚠️  Insufficient data for training: {len(self.data_buffer)} samples")
+        with self._lock:
+            generation = self._generation
+            sample_count = self._count
+            window = self._training_window() if sample_count >= 20 else None
+        
+        if window is None:
+            logger.warning(f"⚠️  Insufficient data for training: {sample_count} samples")
             return
         
         try:
-            logger.info(f"🔄 Training model with {len(self.data_buffer)} samples")
+            logger.info(f"🔄 Training model with {sample_count} samples")
             
-            # Convert buffer to numpy array
-            X = np.array(list(self.data_buffer))
-            
-            # Fit scaler
-            self.scaler.fit(X)
-            X_scaled = self.scaler.transform(X)
+            # Grow the trained forest rather than rebuilding it, until it
+            # reaches its size cap
+            model = self.model
+            warm_start = (
+                self.is_trained
+                and model.n_estimators < MAX_ESTIMATORS
+            )
             
-            # Calculate feature statistics
-            self.feature_means = np.mean(X, axis=0)
-            self.feature_stds = np.std(X, axis=0)
+            if warm_start:
+                # Grow a copy; the current forest keeps serving predictions.
+                # New trees must share the existing trees' feature space, so
+                # keep the standardization from the last full rebuild
+                model = copy.deepcopy(model)
+                model.n_estimators += WARM_START_STEP
+                sc_mean = self._sc_mean
+                sc_inv_scale = self._sc_inv_scale
+                
+                # Statistics of the window that standardization came from
+                means = self.feature_means
+                stds = self.feature_stds
+            else:
+                model = self._build_model()
+                
+                # Calculate feature statistics
+                means = np.mean(window, axis=0, dtype=np.float32)
+                stds = np.std(window, axis=0, dtype=np.float32)
+                
+                # Standardization parameters for the prediction hot path
+                # (near-constant features keep unit scale)
+                sc_mean = means
+                sc_inv_scale = (1.0 / np.where(stds > 1e-6, stds, 1.0)).astype(np.float32)
             
             # Train Isolation Forest
-            self.model.fit(X_scaled)
+            X_scaled = (window - sc_mean) * sc_inv_scale
+            model.fit(X_scaled)
+            
+            # Publish the model together with its parameters
+            with self._lock:
+                if generation != self._generation:
+                    logger.info("⏭️  Detector was reset during training, discarding model")
+                    return
+                
+                self.model = model
+                self._sc_mean = sc_mean
+                self._sc_inv_scale = sc_inv_scale
+                self.feature_means = means
+                self.feature_stds = stds
+                
+                # Cached scores belong to the previous model
+                self._score_cache.clear()
+                
+                self.is_trained = True
             
-            self.is_trained = True
             logger.info("✅ Model training complete")
             
             # Log model performance on training data
-            predictions = self.model.predict(X_scaled)
-            anomaly_ratio = np.sum(predictions == -1) / len(predictions)
+            decisions = model.decision_function(X_scaled)
+            anomaly_ratio = np.sum(decisions < 0) / len(decisions)
             logger.info(f"📊 Training set anomaly ratio: {anomaly_ratio:.2%}")
             
         except Exception as e:
+            # Keep serving the last published model (if any)
             logger.error(f"❌ Model training failed: {e}", exc_info=True)
-            self.is_trained = False
     
-    def _normalize_score(self, decision_score: float) -> float:
-        """
-        Normalize decision function score to 0-1 range
-        
-        Args:
-            decision_score: Raw decision function output (typically -0.5 to 0.5)
-            
-        Returns:
-            Normalized score between 0 (normal) and 1 (anomalous)
-        """
-        # Decision scores typically range from -0.5 (anomalous) to 0.5 (normal)
-        # Map to 0-1 where higher = more anomalous
-        # Use sigmoid-like transformation for smooth gradients
-        
-        # Invert and scale: more negative -> higher anomaly score
-        shifted = -decision_score
-        
-        # Apply sigmoid transformation
-        normalized = 1.0 / (1.0 + np.exp(-10 * shifted))
-        
-        return float(np.clip(normalized, 0.0, 1.0))
-    
-    def _statistical_anomaly_score(self, features: np.ndarray) -> float:
+    def _statistical_anomaly_score(self, sample: np.ndarray) -> float:
         """
         Calculate anomaly score using statistical methods (fallback/complement)
         
         Args:
-            features: Feature vector
+            sample: Feature vector
             
         Returns:
             Statistical anomaly score (0-1)
         """
-        if len(self.data_buffer) < 5:
+        if self._count < 5:
             return 0.0  # Not enough data for statistics
         
         try:
-            # Get historical data
-            historical_data = np.array(list(self.data_buffer)[:-1])  # Exclude current sample
-            
-            if len(historical_data) == 0:
-                return 0.0
-            
-            # Calculate z-scores for each feature
-            means = np.mean(historical_data, axis=0)
-            stds = np.std(historical_data, axis=0) + 1e-6  # Avoid division by zero
-            
-            # Z-score of current sample
-            z_scores = np.abs((features[0] - means) / stds)
-            
-            # Use maximum z-score as anomaly indicator
-            max_z_score = np.max(z_scores)
+            # Maximum z-score of the current sample against the cached
+            # mean/std of the buffered window before it
+            # (converted to a Python float so the scalar math below avoids
+            # NumPy scalar dispatch)
+            max_z_score = float(np.abs((sample - self._window_mean) * self._window_inv_std).max())
             
             # Convert z-score to 0-1 range
             # z > 3 is typically considered anomalous (99.7% confidence)
-            anomaly_score = min(max_z_score / 3.0, 1.0)
-            
-            return float(anomaly_score)
+            return min(max_z_score / 3.0, 1.0)
             
         except Exception as e:
             logger.error(f"❌ Statistical scoring error: {e}")
@@ -261,27 +509,32 @@ class AnomalyDetector:
             else 0.0
         )
         
-        recent_avg_score = (
-            float(np.mean(list(self.anomaly_history))) 
-            if len(self.anomaly_history) > 0 
-            else 0.0
-        )
+        recent_avg_score = self._hist_sum / max(1, self._hist_count)
         
         return {
             'is_trained': self.is_trained,
             'prediction_count': self.prediction_count,
             'anomaly_count': self.anomaly_count,
             'anomaly_rate': anomaly_rate,
-            'buffer_size': len(self.data_buffer),
+            'buffer_size': self._count,
             'recent_avg_score': recent_avg_score,
             'threshold': self.threshold
         }
     
     def reset(self):
         """Reset detector state"""
-        self.data_buffer.clear()
-        self.anomaly_history.clear()
-        self.is_trained = False
+        with self._lock:
+            self._generation += 1
+            self._score_cache.clear()
+            self._head = 0
+            self._count = 0
+            if self._sum is not None:
+                self._sum.fill(0.0)
+                self._sumsq.fill(0.0)
+            self.is_trained = False
+        self._hist_head = 0
+        self._hist_count = 0
+        self._hist_sum = 0.0
         self.prediction_count = 0
         self.anomaly_count = 0
         logger.info("🔄 Anomaly detector reset")
\ No newline at end of file
@@ -9,12 +9,22 @@ import asyncio
 import logging
 import signal
 import sys
+from operator import itemgetter
 from typing import Optional
 from datetime import datetime
 
+import numpy as np
+
 from anomaly_detector import AnomalyDetector
 from websocket_client import SensorWebSocketClient
 
+# Optional JIT compilation of scalar hot paths (plain Python without numba)
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda func: func
+
 # Configure structured logging
 logging.basicConfig(
     level=logging.INFO,
@@ -27,6 +37,50 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Length of the feature vector produced by MLService._extract_features
+FEATURE_COUNT = 14
+
+# Per-feature full-scale values; dividing by these puts every feature in
+# roughly unit range regardless of its physical unit
+GRAVITY = 9.81  # m/s^2
+MAX_SPEED = 20.0  # m/s
+FEATURE_BASELINE = np.array([
+    2 * GRAVITY, 2 * GRAVITY, 2 * GRAVITY,  # Acceleration (m/s^2)
+    np.pi, np.pi, np.pi,                    # Angular rate (rad/s)
+    180.0, 180.0, 180.0,                    # Euler angles (deg)
+    MAX_SPEED,                              # Velocity magnitude (m/s)
+    MAX_SPEED,                              # GPS speed (m/s)
+    360.0,                                  # GPS heading (deg)
+    1.0, 1.0                                # Confidence, system health
+], dtype=np.float32)
+
+# Precompiled key lookups for the fused sensor message schema
+_get_sensor_fields = itemgetter(
+    'raw_acceleration', 'raw_gyroscope', 'euler_degrees', 'velocity',
+    'gps_speed', 'gps_heading', 'confidence', 'system_health'
+)
+_get_xyz = itemgetter('x', 'y', 'z')
+
+
+@njit(cache=True)
+def _fill_features(out, ax, ay, az, gx, gy, gz, roll, pitch, yaw,
+                   vx, vy, vz, gps_speed, gps_heading, confidence, health):
+    """Write one feature vector into a preallocated row"""
+    out[0] = ax
+    out[1] = ay
+    out[2] = az
+    out[3] = gx
+    out[4] = gy
+    out[5] = gz
+    out[6] = roll
+    out[7] = pitch
+    out[8] = yaw
+    out[9] = (vx * vx + vy * vy + vz * vz) ** 0.5
+    out[10] = gps_speed
+    out[11] = gps_heading
+    out[12] = confidence
+    out[13] = health
+
 
 class MLServiceConfig:
     """Configuration for ML service"""
@@ -34,8 +88,11 @@ class MLServiceConfig:
     def __init__(self):
         self.websocket_url = "ws://127.0.0.1:8080"
         self.model_update_interval = 100  # Retrain every N samples
-        self.anomaly_threshold = 0.7  # Anomaly score threshold (0-1)
+        self.anomaly_threshold = 0.66  # Anomaly score threshold (0-1)
         self.buffer_size = 50  # Number of samples to buffer for training
+        self.n_jobs = -1  # CPU cores used to build trees (-1 = all)
+        self.batch_size = 8  # Max samples scored per model call
+        self.batch_max_latency_ms = 5  # Max wait before flushing a partial batch
         self.enable_logging = True
 
 
@@ -50,12 +107,25 @@ class MLService:
         self.config = config
         self.anomaly_detector = AnomalyDetector(
             buffer_size=config.buffer_size,
-            threshold=config.anomaly_threshold
+            threshold=config.anomaly_threshold,
+            buffer_dtype=np.float16,  # Features are baseline-normalized
+            n_jobs=config.n_jobs
         )
         self.ws_client: Optional[SensorWebSocketClient] = None
         self.running = False
         self.sample_count = 0
         
+        # Preallocated feature matrix, one row per sample of a batch
+        self._feature_buf = np.zeros((config.batch_size, FEATURE_COUNT), dtype=np.float32)
+        self._inv_baseline = 1.0 / FEATURE_BASELINE
+        
+        # Incoming samples waiting to be scored as a mini-batch
+        self.sample_queue: Optional[asyncio.Queue] = None
+        self.batch_task: Optional[asyncio.Task] = None
+        
+        # Background retraining (one run at a time)
+        self.retrain_task: Optional[asyncio.Task] = None
+        
         logger.info("🤖 ML Service initialized")
         logger.info(f"📋 Configuration: {vars(config)}")
     
@@ -73,6 +143,10 @@ class MLService:
             # Connect to backend
             await self.ws_client.connect()
             
+            # Start the mini-batch scoring worker
+            self.sample_queue = asyncio.Queue(maxsize=self.config.batch_size * 16)
+            self.batch_task = asyncio.create_task(self._batch_loop())
+            
             self.running = True
             logger.info("✅ ML Service is operational")
             
@@ -88,110 +162,180 @@ class MLService:
     
     async def process_sensor_data(self, sensor_data: dict):
         """
-        Process incoming sensor data and perform anomaly detection
+        Queue incoming sensor data for batched anomaly detection
         
         Args:
             sensor_data: Fused sensor data from backend
         """
-        try:
-            self.sample_count += 1
+        # Blocks the receive loop when the queue is full (backpressure)
+        await self.sample_queue.put(sensor_data)
+    
+    async def _batch_loop(self):
+        """
+        Drain queued samples into mini-batches and score them together
+        
+        A batch is flushed once it holds batch_size samples or its first
+        sample has waited batch_max_latency_ms.
+        """
+        loop = asyncio.get_running_loop()
+        max_latency = self.config.batch_max_latency_ms / 1000.0
+        
+        while True:
+            batch = [await self.sample_queue.get()]
+            deadline = loop.time() + max_latency
             
+            while len(batch) < self.config.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.sample_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            await self._process_batch(batch)
+    
+    async def _process_batch(self, batch: list):
+        """
+        Perform anomaly detection on a batch of sensor samples
+        
+        Args:
+            batch: Fused sensor data messages in arrival order
+        """
+        try:
             # Extract features for anomaly detection
-            features = self._extract_features(sensor_data)
+            features = self._feature_buf[:len(batch)]
+            for sensor_data, row in zip(batch, features):
+                self._extract_features(sensor_data, row)
+            features *= self._inv_baseline
             
             # Perform anomaly detection
-            anomaly_score = self.anomaly_detector.predict(features)
-            
-            # Log high anomalies
-            if anomaly_score > self.config.anomaly_threshold:
-                logger.warning(
-                    f"⚠️  ANOMALY DETECTED! Score: {anomaly_score:.3f} "
-                    f"at {sensor_data.get('timestamp', 'unknown')}"
-                )
+            anomaly_scores = self.anomaly_detector.predict_batch(features)
             
-            # Periodically retrain model with accumulated data
-            if self.sample_count % self.config.model_update_interval == 0:
-                logger.info(f"🔄 Updating model after {self.sample_count} samples")
-                self.anomaly_detector.update_model()
+            for sensor_data, anomaly_score in zip(batch, anomaly_scores):
+                self.sample_count += 1
+                
+                # Log high anomalies
+                if anomaly_score > self.config.anomaly_threshold:
+                    logger.warning(
+                        f"⚠️  ANOMALY DETECTED! Score: {anomaly_score:.3f} "
+                        f"at {sensor_data.get('timestamp', 'unknown')}"
+                    )
+                
+                # Periodically retrain model with accumulated data
+                if self.sample_count % self.config.model_update_interval == 0:
+                    logger.info(f"🔄 Updating model after {self.sample_count} samples")
+                    if self.retrain_task and not self.retrain_task.done():
+                        logger.info("⏭️  Previous model update still running, skipping")
+                    else:
+                        self.retrain_task = asyncio.create_task(self._retrain_model())
+                
+                # Log progress
+                if self.sample_count % 50 == 0:
+                    logger.info(
+                        f"📊 Processed {self.sample_count} samples | "
+                        f"Latest anomaly score: {anomaly_score:.3f}"
+                    )
             
-            # Send anomaly score back to backend
+            # Send anomaly scores back to backend
             if self.ws_client:
-                await self.ws_client.send_anomaly_score(anomaly_score)
-            
-            # Log progress
-            if self.sample_count % 50 == 0:
-                logger.info(
-                    f"📊 Processed {self.sample_count} samples | "
-                    f"Latest anomaly score: {anomaly_score:.3f}"
+                await asyncio.gather(
+                    *(self.ws_client.send_anomaly_score(score) for score in anomaly_scores)
                 )
                 
         except Exception as e:
             logger.error(f"❌ Error processing sensor data: {e}", exc_info=True)
     
-    def _extract_features(self, sensor_data: dict) -> list:
+    async def _retrain_model(self):
+        """
+        Retrain the anomaly detector in a worker thread
+        
+        Predictions keep using the current model until the new one is
+        swapped in.
+        """
+        await asyncio.to_thread(self.anomaly_detector.update_model)
+    
+    def _extract_features(self, sensor_data: dict, out: np.ndarray):
         """
         Extract relevant features from sensor data for ML model
         
         Args:
             sensor_data: Raw sensor data dictionary
+            out: Row of length FEATURE_COUNT to fill with the feature vector
+        """
+        try:
+            # Fast path: the backend always sends every field
+            (raw_accel, raw_gyro, euler, velocity,
+             gps_speed, gps_heading, confidence, health) = _get_sensor_fields(sensor_data)
+            roll, pitch, yaw = euler
+            ax, ay, az = _get_xyz(raw_accel)
+            gx, gy, gz = _get_xyz(raw_gyro)
+            vx, vy, vz = _get_xyz(velocity)
             
-        Returns:
-            Feature vector for anomaly detection
+            # float() rejects nulls, which would otherwise be stored as NaN
+            # when _fill_features runs as plain Python
+            _fill_features(
+                out,
+                float(ax), float(ay), float(az),
+                float(gx), float(gy), float(gz),
+                float(roll), float(pitch), float(yaw),
+                float(vx), float(vy), float(vz),
+                float(gps_speed), float(gps_heading),
+                float(confidence), float(health)
+            )
+            
+        except Exception:
+            # Missing or malformed fields: fall back to per-field defaults
+            self._extract_features_lenient(sensor_data, out)
+    
+    def _extract_features_lenient(self, sensor_data: dict, out: np.ndarray):
         """
-        features = []
+        Extract features, substituting defaults for missing fields
         
+        Args:
+            sensor_data: Raw sensor data dictionary
+            out: Row of length FEATURE_COUNT to fill with the feature vector
+        """
         try:
             # Extract raw sensor readings
             raw_accel = sensor_data.get('raw_acceleration', {})
             raw_gyro = sensor_data.get('raw_gyroscope', {})
-            
-            # Accelerometer features
-            features.extend([
-                raw_accel.get('x', 0.0),
-                raw_accel.get('y', 0.0),
-                raw_accel.get('z', 0.0)
-            ])
-            
-            # Gyroscope features
-            features.extend([
-                raw_gyro.get('x', 0.0),
-                raw_gyro.get('y', 0.0),
-                raw_gyro.get('z', 0.0)
-            ])
+            velocity = sensor_data.get('velocity', {})
             
             # Euler angles
             euler = sensor_data.get('euler_degrees', (0.0, 0.0, 0.0))
-            if isinstance(euler, (list, tuple)) and len(euler) >= 3:
-                features.extend(euler[:3])
-            else:
-                features.extend([0.0, 0.0, 0.0])
+            if not (isinstance(euler, (list, tuple)) and len(euler) >= 3):
+                euler = (0.0, 0.0, 0.0)
             
-            # Velocity magnitude
-            velocity = sensor_data.get('velocity', {})
-            vel_x = velocity.get('x', 0.0)
-            vel_y = velocity.get('y', 0.0)
-            vel_z = velocity.get('z', 0.0)
-            vel_magnitude = (vel_x**2 + vel_y**2 + vel_z**2)**0.5
-            features.append(vel_magnitude)
-            
-            # GPS metrics
-            features.extend([
-                sensor_data.get('gps_speed', 0.0),
-                sensor_data.get('gps_heading', 0.0)
-            ])
-            
-            # System health indicators
-            features.extend([
-                sensor_data.get('confidence', 1.0),
-                sensor_data.get('system_health', 1.0)
-            ])
+            _fill_features(
+                out,
+                # Accelerometer features
+                float(raw_accel.get('x', 0.0)),
+                float(raw_accel.get('y', 0.0)),
+                float(raw_accel.get('z', 0.0)),
+                # Gyroscope features
+                float(raw_gyro.get('x', 0.0)),
+                float(raw_gyro.get('y', 0.0)),
+                float(raw_gyro.get('z', 0.0)),
+                float(euler[0]),
+                float(euler[1]),
+                float(euler[2]),
+                # Velocity (reduced to magnitude)
+                float(velocity.get('x', 0.0)),
+                float(velocity.get('y', 0.0)),
+                float(velocity.get('z', 0.0)),
+                # GPS metrics
+                float(sensor_data.get('gps_speed', 0.0)),
+                float(sensor_data.get('gps_heading', 0.0)),
+                # System health indicators
+                float(sensor_data.get('confidence', 1.0)),
+                float(sensor_data.get('system_health', 1.0))
+            )
             
         except Exception as e:
             logger.error(f"⚠️  Feature extraction error: {e}")
-            # Return zero vector on error
-            features = [0.0] * 14
-        
-        return features
+            # Use zero vector on error
+            out.fill(0.0)
     
     async def shutdown(self):
         """Graceful shutdown of ML service"""
@@ -199,6 +343,18 @@ class MLService:
         
         self.running = False
         
+        if self.batch_task:
+            self.batch_task.cancel()
+            try:
+                await self.batch_task
+            except asyncio.CancelledError:
+                pass
+        
+        # Let an in-flight retrain finish; its worker thread cannot be
+        # cancelled and still has to publish its model
+        if self.retrain_task:
+            await self.retrain_task
+        
         if self.ws_client:
             await self.ws_client.disconnect()
         
@@ -6,14 +6,19 @@ and the Rust telemetry backend.
 """
 
 import asyncio
-import json
 import logging
-from typing import Callable, Optional, Awaitable
+import time
+from typing import Callable, Optional, Awaitable, Union
+import msgpack
+import orjson
 import websockets
 from websockets.exceptions import ConnectionClosed, WebSocketException
 
 logger = logging.getLogger(__name__)
 
+# Messages larger than this are JSON-decoded in a worker thread
+LARGE_MESSAGE_BYTES = 4096
+
 
 class SensorWebSocketClient:
     """
@@ -46,6 +51,16 @@ class SensorWebSocketClient:
         self.messages_sent = 0
         self.reconnect_count = 0
         
+        # Reused MessagePack encoder for anomaly scores
+        self._packer = msgpack.Packer(use_bin_type=True)
+        
+        # Reused heartbeat payload; only the timestamp changes per send
+        self._heartbeat_message = {"type": "heartbeat", "timestamp": ""}
+        
+        # Cached date/time prefix of the current UTC second for timestamps
+        self._ts_second = -1
+        self._ts_prefix = ""
+        
         logger.info(f"🔌 WebSocket client initialized for {url}")
     
     async def connect(self):
@@ -59,7 +74,9 @@ class SensorWebSocketClient:
                 self.url,
                 ping_interval=20,  # Send ping every 20 seconds
                 ping_timeout=10,   # Wait 10 seconds for pong
-                close_timeout=5    # Close timeout
+                close_timeout=5,   # Close timeout
+                max_size=2**20,    # Reject frames over 1 MiB (the library default)
+                max_queue=64       # Buffer up to 64 frames (default 32) to absorb bursts
             )
             
             self.connected = True
@@ -118,18 +135,21 @@ class SensorWebSocketClient:
                 else:
                     break
     
-    async def _handle_message(self, message: str):
+    async def _handle_message(self, message: Union[str, bytes]):
         """
         Process incoming message
         
         Args:
-            message: Raw message string from WebSocket
+            message: Raw message (text or binary frame) from WebSocket
         """
         try:
             self.messages_received += 1
             
-            # Parse JSON
-            data = json.loads(message)
+            # Parse JSON (large payloads off the event loop)
+            if len(message) > LARGE_MESSAGE_BYTES:
+                data = await asyncio.to_thread(orjson.loads, message)
+            else:
+                data = orjson.loads(message)
             
             # Check message type
             msg_type = data.get('type')
@@ -150,7 +170,7 @@ class SensorWebSocketClient:
             if self.messages_received % 100 == 0:
                 logger.info(f"📊 Received {self.messages_received} messages")
                 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"❌ JSON decode error: {e} | Message: {message[:100]}")
         except Exception as e:
             logger.error(f"❌ Message handling error: {e}", exc_info=True)
@@ -173,7 +193,7 @@ class SensorWebSocketClient:
                 "timestamp": self._get_timestamp()
             }
             
-            await self.websocket.send(json.dumps(message))
+            await self.websocket.send(self._packer.pack(message))
             self.messages_sent += 1
             
             # Log occasionally
@@ -203,7 +223,7 @@ class SensorWebSocketClient:
                 "timestamp": self._get_timestamp()
             }
             
-            await self.websocket.send(json.dumps(message))
+            await self.websocket.send(orjson.dumps(message))
             logger.info(f"⚡ Sent command: {action}")
             
         except Exception as e:
@@ -215,12 +235,10 @@ class SensorWebSocketClient:
             return
         
         try:
-            message = {
-                "type": "heartbeat",
-                "timestamp": self._get_timestamp()
-            }
+            message = self._heartbeat_message
+            message["timestamp"] = self._get_timestamp()
             
-            await self.websocket.send(json.dumps(message))
+            await self.websocket.send(orjson.dumps(message))
             
         except Exception as e:
             logger.debug(f"⚠️  Heartbeat failed: {e}")
@@ -262,9 +280,15 @@ class SensorWebSocketClient:
         logger.info(f"📊 Final stats: {self.messages_received} received, {self.messages_sent} sent")
     
     def _get_timestamp(self) -> str:
-        """Get current ISO timestamp"""
-        from datetime import datetime, timezone
-        return datetime.now(timezone.utc).isoformat()
+        """Get current ISO timestamp (UTC, microsecond precision)"""
+        seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+        
+        # Only format the date/time part when the second rolls over
+        if seconds != self._ts_second:
+            self._ts_second = seconds
+            self._ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        
+        return f"{self._ts_prefix}.{nanos // 1000:06d}+00:00"
     
     def get_stats(self) -> dict:
         """